@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import math
+import uuid
 from bokeh.plotting import figure
-from bokeh.models import HoverTool
+from bokeh.document import Document
+from bokeh.layouts import column, row
+from bokeh.models import ColumnDataSource, CustomJS, HoverTool, RangeSlider
 from streamlit_bokeh import streamlit_bokeh
 
 # --- Configuración de la Página y Estilo ---
@@ -14,7 +18,7 @@ st.set_page_config(
 )
 
 # Estilo CSS para un diseño más pulido
-st.markdown("""
+ESTILO_CSS = """
 <style>
     .stApp { background: #F0F2F6; }
     .st-emotion-cache-1jicfl2 {
@@ -31,84 +35,173 @@ st.markdown("""
     }
     .stButton>button:hover { background-color: white; color: #1E3A8A; }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(ESTILO_CSS, unsafe_allow_html=True)
+
+# Configuración estática de la gráfica. La figura solo se reconstruye cuando cambian los
+# marcadores o los lubricantes (ver mostrar_grafica); cada curva añade a los tooltips su fila
+# de "Viscosidad" con su propia columna (ver _construir_grafica)
+TOOLTIPS_GRAFICA = [("Lubricante", "$name"), ("Temperatura", "@x{0.0}°C")]
+HERRAMIENTAS_GRAFICA = "pan,wheel_zoom,box_zoom,reset,save"
+COLORES_GRAFICA = ('#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b')
+OPCIONES_FIGURA = dict(
+    height=500, sizing_mode="stretch_width",
+    x_axis_label="Temperatura (°C)", y_axis_label="Viscosidad Cinemática (cSt)",
+    title="Comportamiento de la Viscosidad"
+)
+# Ejes y sliders de rango se sincronizan en el navegador, sin relanzar el script: el slider
+# mueve su eje, y cualquier cambio del eje (slider, pan, zoom, reset) se refleja en el slider
+# y se guarda en sessionStorage para restaurarlo cuando la figura se reconstruye
+SLIDER_A_RANGO_JS = """
+const [inicio, fin] = cb_obj.value;
+const limitar = (v) => Math.min(Math.max(v, cb_obj.start), cb_obj.end);
+// El slider solo refleja un rango ya aplicado (p. ej. un pan más allá de sus límites)
+if (limitar(rango.start) === inicio && limitar(rango.end) === fin) return;
+rango.setv({start: inicio, end: fin});
+"""
+RANGO_A_SLIDER_JS = """
+const limitar = (v) => Math.min(Math.max(v, slider.start), slider.end);
+slider.value = [limitar(rango.start), limitar(rango.end)];
+sessionStorage.setItem(clave, JSON.stringify([rango.start, rango.end, slider.end]));
+"""
+# Como los sliders del original, el rango Y solo se conserva si su límite no cambió
+RESTAURAR_RANGO_JS = """
+const guardado = JSON.parse(sessionStorage.getItem(clave) ?? "null");
+if (guardado !== null && guardado[2] === slider.end) rango.setv({start: guardado[0], end: guardado[1]});
+"""
+
+# Color de las barras de viscosidad en la tabla
+COLOR_BARRAS = '#AEC6CF'
 
 # --- Funciones de Cálculo ---
 
+# Rejilla fija de temperaturas (°C) sobre la que se traza cada curva:
+# cada 2 °C más los múltiplos de 5 °C: 91 puntos en lugar de 151, y todas las opciones de
+# marcadores (múltiplos de 5) y de la tabla (múltiplos de 10) siguen cayendo en la rejilla
+TEMPERATURAS_GRAFICA = np.union1d(np.arange(0, 151, 2), np.arange(0, 151, 5)).astype(np.float64)
+TEMPERATURAS_GRAFICA.setflags(write=False)
+# Copia float32 de la rejilla para la columna 'x' que comparten todas las curvas de la gráfica
+TEMPERATURAS_GRAFICA_F32 = TEMPERATURAS_GRAFICA.astype(np.float32)
+TEMPERATURAS_GRAFICA_F32.setflags(write=False)
+# ln(T) en Kelvin de la rejilla, precalculado: la rejilla nunca cambia
+LOG_TEMPERATURAS_GRAFICA_K = np.log(TEMPERATURAS_GRAFICA + 273.15)
+LOG_TEMPERATURAS_GRAFICA_K.setflags(write=False)
+
+# 10**(10**Z) se evalúa como exp(exp(Z')) con Z' = ln(ln10) + ln10*A - B*ln(T)
+LN10 = np.log(10.0)
+LN_LN10 = np.log(LN10)
+
+# Constante de Walther y log10 de las temperaturas de referencia (40 y 100 °C en K)
+C_WALTHER = 0.7
+LOG_T1 = math.log10(40 + 273.15)
+LOG_T2 = math.log10(100 + 273.15)
+
 def calcular_constantes_walther(visc_40, visc_100):
-    C = 0.7
-    T1_k, T2_k = 40 + 273.15, 100 + 273.15
-    try:
-        Z1 = np.log10(np.log10(visc_40 + C))
-        Z2 = np.log10(np.log10(visc_100 + C))
-        logT1, logT2 = np.log10(T1_k), np.log10(T2_k)
-        B = (Z1 - Z2) / (logT2 - logT1)
-        A = Z1 + B * logT1
-    except (ValueError, TypeError):
-        return None, None, None
-    return A, B, C
-
-def calcular_viscosidad_walther(temperaturas_c, visc_40, visc_100):
-    if visc_40 <= 0 or visc_100 <= 0 or visc_40 <= visc_100:
-        return np.full_like(np.array(temperaturas_c, dtype=float), np.nan)
-    A, B, C = calcular_constantes_walther(visc_40, visc_100)
-    if A is None:
-        return np.full_like(np.array(temperaturas_c, dtype=float), np.nan)
-    
-    temps_k = np.array(temperaturas_c) + 273.15
-    viscosidades = np.full_like(temps_k, np.nan, dtype=float)
-    valid_indices = temps_k > 0
+    Z1 = math.log10(math.log10(visc_40 + C_WALTHER))
+    Z2 = math.log10(math.log10(visc_100 + C_WALTHER))
+    B = (Z1 - Z2) / (LOG_T2 - LOG_T1)
+    A = Z1 + B * LOG_T1
+    return A, B, C_WALTHER
+
+def calcular_viscosidad_desde_constantes(logT, A, B, C):
+    """
+    Evalúa la ecuación de Walther con constantes A, B, C ya calculadas sobre
+    logT, el ln de las temperaturas en K (p. ej. LOG_TEMPERATURAS_GRAFICA_K).
+    A, B y C pueden ser arrays (uno por lubricante) que se difunden contra
+    las temperaturas, p. ej. constantes de forma (L, 1) y logT de forma (T,).
+    """
+    A_nat = LN_LN10 + np.multiply(A, LN10)
     with np.errstate(invalid='ignore', over='ignore'):
-        logT_valid = np.log10(temps_k[valid_indices])
-        Z_calc = A - B * logT_valid
-        visc_calc = (10**(10**Z_calc)) - C
-        viscosidades[valid_indices] = visc_calc
+        viscosidades = np.multiply(logT, np.negative(B))
+        viscosidades += A_nat
+        np.exp(viscosidades, out=viscosidades)
+        np.exp(viscosidades, out=viscosidades)
+        viscosidades -= C
     return viscosidades
 
-def get_viscosidad_a_temp(temp_objetivo_c, visc_40, visc_100):
-    viscosidad_array = calcular_viscosidad_walther([temp_objetivo_c], visc_40, visc_100)
-    return viscosidad_array[0] if viscosidad_array is not None else np.nan
+def constantes_lubricante(lub):
+    """Devuelve (A, B, C) del lubricante, calculándolas si aún no están guardadas."""
+    if 'A' not in lub:
+        lub['A'], lub['B'], lub['C'] = calcular_constantes_walther(lub['visc_40'], lub['visc_100'])
+    return lub['A'], lub['B'], lub['C']
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _curvas_walther(A, B, C):
+    """
+    Curvas de Walther de varios lubricantes sobre TEMPERATURAS_GRAFICA, una
+    fila por lubricante, evaluadas en una sola pasada y cacheadas entre reruns.
+    """
+    return calcular_viscosidad_desde_constantes(
+        LOG_TEMPERATURAS_GRAFICA_K, np.asarray(A)[:, None], np.asarray(B)[:, None], np.asarray(C)[:, None]
+    )
+
+def _leer_curvas(curvas, temperaturas_c):
+    """
+    Lee de las curvas (L, T) de _curvas_walther la viscosidad de cada lubricante a
+    las temperaturas dadas, interpolando linealmente sobre TEMPERATURAS_GRAFICA.
+    Es exacto para puntos de la rejilla, como las opciones de marcadores y tabla.
+    """
+    t = np.asarray(temperaturas_c, dtype=float)
+    i = np.clip(np.searchsorted(TEMPERATURAS_GRAFICA, t), 1, len(TEMPERATURAS_GRAFICA) - 1)
+    w = np.clip((t - TEMPERATURAS_GRAFICA[i - 1]) / (TEMPERATURAS_GRAFICA[i] - TEMPERATURAS_GRAFICA[i - 1]), 0.0, 1.0)
+    return (1.0 - w) * curvas[:, i - 1] + w * curvas[:, i]
 
 # --- FUNCIÓN DE CÁLCULO DE IV - VERSIÓN DEFINITIVA Y VALIDADA ---
+
+# Tablas de referencia basadas en ASTM D2270, Tabla A1.
+# Cubre el rango más común de viscosidades para aceites de motor.
+Y_TABLE = np.array([10.0, 11.0, 12.0, 13.0, 14.0, 15.0, 16.0, 17.0, 18.0, 19.0, 20.0, 25.0, 30.0, 40.0, 50.0, 75.0])
+L_TABLE = np.array([157.1, 182.2, 209.0, 237.4, 267.6, 299.7, 333.8, 370.2, 408.8, 450.0, 493.6, 737.5, 1022.0, 1716.0, 2549.0, 5133.0])
+H_TABLE = np.array([109.8, 120.5, 131.5, 142.9, 154.6, 166.7, 179.2, 192.1, 205.4, 219.1, 233.2, 298.8, 363.6, 492.2, 621.4, 918.0])
+
+def _interpolar_tablas_lh(Y):
+    """
+    L y H para un array de kv100 con una sola búsqueda del tramo de la tabla,
+    compartida por ambas interpolaciones (mismo resultado que np.interp).
+    """
+    i = np.clip(np.searchsorted(Y_TABLE, Y), 1, len(Y_TABLE) - 1)
+    t = np.clip((Y - Y_TABLE[i - 1]) / (Y_TABLE[i] - Y_TABLE[i - 1]), 0.0, 1.0)
+    L = L_TABLE[i - 1] + t * (L_TABLE[i] - L_TABLE[i - 1])
+    H = H_TABLE[i - 1] + t * (H_TABLE[i] - H_TABLE[i - 1])
+    return L, H
+
+@st.cache_data(max_entries=256, show_spinner=False)
 def calcular_indice_viscosidad(kv40, kv100):
     """
     Calcula el Índice de Viscosidad (IV) según la norma ASTM D2270.
     Esta versión utiliza interpolación sobre tablas de referencia del estándar
     para garantizar la máxima precisión.
+    Acepta escalares o secuencias (un valor por lubricante) y se evalúa sin
+    ramas, eligiendo el procedimiento A o B elemento a elemento.
     """
-    if kv100 is None or kv40 is None or kv100 < 2.0 or kv100 >= kv40:
-        return np.nan
-
-    Y = kv100
-    U = kv40
+    U = np.asarray(kv40, dtype=float)
+    Y = np.asarray(kv100, dtype=float)
 
-    # Tablas de referencia basadas en ASTM D2270, Tabla A1.
-    # Cubre el rango más común de viscosidades para aceites de motor.
-    Y_TABLE = [10.0, 11.0, 12.0, 13.0, 14.0, 15.0, 16.0, 17.0, 18.0, 19.0, 20.0, 25.0, 30.0, 40.0, 50.0, 75.0]
-    L_TABLE = [157.1, 182.2, 209.0, 237.4, 267.6, 299.7, 333.8, 370.2, 408.8, 450.0, 493.6, 737.5, 1022.0, 1716.0, 2549.0, 5133.0]
-    H_TABLE = [109.8, 120.5, 131.5, 142.9, 154.6, 166.7, 179.2, 192.1, 205.4, 219.1, 233.2, 298.8, 363.6, 492.2, 621.4, 918.0]
-    
     # Interpolar para encontrar L y H para el valor Y del aceite
-    L = np.interp(Y, Y_TABLE, L_TABLE)
-    H = np.interp(Y, Y_TABLE, H_TABLE)
-
-    # Decidir qué procedimiento usar (A o B) basado en U vs H
-    if U > L:
-        # Caso raro de IV negativo
-        return ((L - U)/(L - H)) * 100
+    L, H = _interpolar_tablas_lh(Y)
 
-    if U <= H:  # Procedimiento B (para IV > 100)
+    # Ambos procedimientos se calculan siempre; np.where descarta el que no aplica
+    with np.errstate(divide='ignore', invalid='ignore'):
         N = (np.log10(H) - np.log10(U)) / np.log10(Y)
-        IV = ((10**N - 1) / 0.00715) + 100
-    else:  # Procedimiento A (para IV <= 100)
-        IV = ((L - U) / (L - H)) * 100
-    
-    return IV
+        IV_B = (np.expm1(N * LN10) / 0.00715) + 100  # Procedimiento B (para IV > 100); expm1(N*ln10) = 10**N - 1
+        IV_A = ((L - U) / (L - H)) * 100  # Procedimiento A; también cubre U > L (IV negativo)
+    IV = np.where(U <= H, IV_B, IV_A)
+    IV[(Y < 2.0) | (Y >= U)] = np.nan
+    return IV if IV.ndim else float(IV)
 
+def iv_lubricante(lub):
+    """Devuelve el IV calculado del lubricante, calculándolo si aún no está guardado."""
+    if 'iv' not in lub:
+        lub['iv'] = calcular_indice_viscosidad(lub['visc_40'], lub['visc_100'])
+    return lub['iv']
 
 # --- Estado de la Aplicación ---
+# Lubricantes indexados por un id estable: borrar uno no cambia las claves de los demás
 if 'lubricantes' not in st.session_state:
-    st.session_state.lubricantes = []
+    st.session_state.lubricantes = {}
+elif isinstance(st.session_state.lubricantes, list):
+    # Sesiones abiertas con la versión anterior guardaban una lista: se le asigna un id a cada uno
+    st.session_state.lubricantes = {uuid.uuid4().hex: lub for lub in st.session_state.lubricantes}
 
 # --- Barra Lateral (Sidebar) ---
 with st.sidebar:
@@ -125,105 +218,170 @@ with st.sidebar:
                 st.warning("Por favor, ingrese un nombre para el lubricante.")
             elif visc_40 <= visc_100:
                 st.error("La viscosidad a 40°C debe ser mayor que a 100°C.")
+            elif any(lub['nombre'] == nombre for lub in st.session_state.lubricantes.values()):
+                st.error(f"Ya existe un lubricante llamado '{nombre}'.")
             else:
-                st.session_state.lubricantes.append({
-                    "nombre": nombre, "visc_40": visc_40, "visc_100": visc_100, "iv_declarado": iv_declarado
-                })
+                A, B, C = calcular_constantes_walther(visc_40, visc_100)
+                st.session_state.lubricantes[uuid.uuid4().hex] = {
+                    "nombre": nombre, "visc_40": visc_40, "visc_100": visc_100, "iv_declarado": iv_declarado,
+                    "A": A, "B": B, "C": C, "iv": calcular_indice_viscosidad(visc_40, visc_100)
+                }
                 st.success(f"¡Lubricante '{nombre}' agregado!")
 
     st.header("📋 Lubricantes Agregados")
-    for lub in st.session_state.lubricantes[:]:
+    for uid, lub in list(st.session_state.lubricantes.items()):
         with st.expander(f"{lub['nombre']}"):
             st.write(f"Visc. 40°C: **{lub['visc_40']} cSt**")
             st.write(f"Visc. 100°C: **{lub['visc_100']} cSt**")
             st.write(f"IV Declarado: **{lub['iv_declarado']}**")
-            if st.button(f"🗑️ Eliminar '{lub['nombre']}'", key=f"del_{lub['nombre']}"):
-                st.session_state.lubricantes.remove(lub)
+            if st.button(f"🗑️ Eliminar '{lub['nombre']}'", key=f"del_{uid}"):
+                del st.session_state.lubricantes[uid]
                 st.rerun()
 
     if st.session_state.lubricantes and st.button("🗑️ Limpiar Todo", use_container_width=True):
-        st.session_state.lubricantes = []
+        st.session_state.lubricantes = {}
         st.rerun()
 
 # --- Área Principal ---
-st.title("📊 Analizador de Viscosidad de Lubricantes")
+def _construir_grafica(lubricantes, A, B, C, puntos_a_marcar):
+    """Figura de Bokeh con las curvas, los marcadores y los sliders de los ejes."""
+    lista_visc_40 = [lub['visc_40'] for lub in lubricantes]
+    y_max_calculado = float(max(lista_visc_40) * 1.1 if lista_visc_40 else 100.0)
 
-if not st.session_state.lubricantes:
-    st.info("Agregue al menos un lubricante en la barra lateral para comenzar.")
-else:
-    st.subheader("⚙️ Opciones de Gráfica")
-    puntos_a_marcar = st.multiselect(
-        "Seleccione hasta 3 temperaturas para resaltar:",
-        options=list(range(0, 151, 5)), max_selections=3, default=[40, 100]
+    p = figure(
+        tools=HERRAMIENTAS_GRAFICA, x_range=(0, 150), y_range=(0.0, y_max_calculado),
+        **OPCIONES_FIGURA
     )
-    
-    lista_visc_40 = [lub['visc_40'] for lub in st.session_state.lubricantes]
-    y_max_calculado = max(lista_visc_40) * 1.1 if lista_visc_40 else 100.0
-
-    col1, col2 = st.columns(2)
-    with col1:
-        y_axis_range = st.slider(
-            "Ajustar Rango Eje Y (Viscosidad)",
-            min_value=0.0, max_value=float(y_max_calculado),
-            value=(0.0, float(y_max_calculado)), step=1.0
-        )
-    with col2:
-        x_axis_range = st.slider(
-            "Ajustar Rango Eje X (Temperatura)",
-            min_value=0, max_value=150, value=(0, 150), step=5
-        )
 
-    st.header("📉 Gráfica Comparativa de Viscosidad")
-    hover = HoverTool(
-        tooltips=[("Lubricante", "$name"), ("Temperatura", "@x{0.0}°C"), ("Viscosidad", "@y{0.2f} cSt")],
-        mode='vline'
+    # Rangos de los ejes ajustados en el navegador mediante CustomJS
+    slider_y = RangeSlider(
+        title="Ajustar Rango Eje Y (Viscosidad)", start=0.0, end=y_max_calculado,
+        value=(0.0, y_max_calculado), step=1.0, sizing_mode="stretch_width"
     )
-    p = figure(
-        height=500, sizing_mode="stretch_width", tools=[hover, "pan,wheel_zoom,box_zoom,reset,save"],
-        x_axis_label="Temperatura (°C)", y_axis_label="Viscosidad Cinemática (cSt)",
-        title="Comportamiento de la Viscosidad",
-        x_range=x_axis_range, y_range=y_axis_range
+    slider_x = RangeSlider(
+        title="Ajustar Rango Eje X (Temperatura)", start=0, end=150,
+        value=(0, 150), step=5, sizing_mode="stretch_width"
     )
+    restaurar_rangos = []
+    for rango, slider, clave in ((p.x_range, slider_x, "viscosidad_rango_x"), (p.y_range, slider_y, "viscosidad_rango_y")):
+        slider.js_on_change('value', CustomJS(args=dict(rango=rango), code=SLIDER_A_RANGO_JS))
+        sincronizar = CustomJS(args=dict(rango=rango, slider=slider, clave=clave), code=RANGO_A_SLIDER_JS)
+        rango.js_on_change('start', sincronizar)
+        rango.js_on_change('end', sincronizar)
+        restaurar_rangos.append(CustomJS(args=dict(rango=rango, slider=slider, clave=clave), code=RESTAURAR_RANGO_JS))
     
-    temperaturas_grafica = np.arange(0, 151, 1)
-    colores = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b']
+    colores_lub = [COLORES_GRAFICA[i % len(COLORES_GRAFICA)] for i in range(len(lubricantes))]
     
-    for i, lub in enumerate(st.session_state.lubricantes):
-        color_actual = colores[i % len(colores)]
-        viscosidades = calcular_viscosidad_walther(temperaturas_grafica, lub['visc_40'], lub['visc_100'])
-        p.line(x=temperaturas_grafica, y=viscosidades, legend_label=f"{lub['nombre']} (IV Dec: {lub['iv_declarado']})", color=color_actual, line_width=3, name=lub['nombre'])
-        if puntos_a_marcar:
-            visc_puntos = [get_viscosidad_a_temp(t, lub['visc_40'], lub['visc_100']) for t in puntos_a_marcar]
-            p.scatter(x=puntos_a_marcar, y=visc_puntos, marker='cross', color=color_actual, size=12, line_width=2, name=lub['nombre'])
+    # La gráfica solo necesita precisión float32: reduce a la mitad los datos enviados al navegador
+    curvas = _curvas_walther(A, B, C).astype(np.float32)
+    
+    # Curvas: columna 'x' compartida y una columna 'y{i}' por lubricante. Las columnas se
+    # nombran por posición: el nombre escrito por el usuario (p. ej. "x") nunca es una clave
+    datos_curvas = {'x': TEMPERATURAS_GRAFICA_F32}
+    for j in range(len(lubricantes)):
+        datos_curvas[f"y{j}"] = curvas[j]
+    fuente_curvas = ColumnDataSource(datos_curvas)
+    
+    for i, lub in enumerate(lubricantes):
+        color_actual = colores_lub[i]
+        linea = p.line('x', f"y{i}", source=fuente_curvas, legend_label=f"{lub['nombre']} (IV Dec: {lub['iv_declarado']})", color=color_actual, line_width=3, name=lub['nombre'])
+        # Un hover por curva: $name muestra el nombre como valor, sin interpretarlo como plantilla.
+        # En modo 'vline' sobre las curvas ya muestra el valor en cada marcador
+        p.add_tools(HoverTool(
+            renderers=[linea], mode='vline',
+            tooltips=TOOLTIPS_GRAFICA + [("Viscosidad", f"@y{i}{{0.2f}} cSt")]
+        ))
+    
+    if puntos_a_marcar:
+        # Todos los marcadores en un único glifo: una fila por (lubricante, temperatura)
+        temps_puntos = np.asarray(puntos_a_marcar, dtype=float)
+        puntos = _leer_curvas(curvas, temps_puntos)
+        fuente_puntos = ColumnDataSource({
+            'x': np.tile(temps_puntos, len(lubricantes)),
+            'y': puntos.ravel().astype(np.float32),
+            'color': [color for color in colores_lub for _ in puntos_a_marcar]
+        })
+        p.scatter('x', 'y', source=fuente_puntos, marker='cross', color='color', size=12, line_width=2)
     
     p.legend.location = "top_right"
     p.legend.click_policy = "hide"
     p.title.align = "center"
-    streamlit_bokeh(p, use_container_width=True)
+    grafica = column(row(slider_y, slider_x, sizing_mode="stretch_width"), p, sizing_mode="stretch_width")
+    # 'document_ready' solo se dispara desde callbacks del documento, no de los modelos
+    documento = Document()
+    documento.add_root(grafica)
+    for restaurar in restaurar_rangos:
+        documento.js_on_event('document_ready', restaurar)
+    return grafica
 
+@st.fragment
+def mostrar_grafica(lubricantes, A, B, C):
+    """Opciones y gráfica comparativa; sus widgets solo relanzan este fragmento."""
+    st.subheader("⚙️ Opciones de Gráfica")
+    puntos_a_marcar = st.multiselect(
+        "Seleccione hasta 3 temperaturas para resaltar:",
+        options=list(range(0, 151, 5)), max_selections=3, default=[40, 100]
+    )
+    
+    st.header("📉 Gráfica Comparativa de Viscosidad")
+    # La figura solo depende de los lubricantes y de los marcadores: si no cambiaron
+    # desde el último render se reutiliza la misma, sin volver a construir sus modelos
+    firma = (
+        tuple(puntos_a_marcar),
+        tuple((lub['nombre'], lub['visc_40'], lub['visc_100'], lub['iv_declarado']) for lub in lubricantes)
+    )
+    if st.session_state.get('_firma_grafica') != firma:
+        st.session_state._firma_grafica = firma
+        st.session_state._grafica = _construir_grafica(lubricantes, A, B, C, puntos_a_marcar)
+    streamlit_bokeh(st.session_state._grafica, use_container_width=True)
+
+@st.fragment
+def mostrar_tabla(lubricantes, A, B, C):
+    """Tabla comparativa; cambiar sus temperaturas no reconstruye la gráfica."""
     st.header("🔢 Tabla de Datos Comparativos")
     temps_seleccionadas = st.multiselect("Temperaturas para la tabla:", options=list(range(0, 151, 10)), default=[40, 100])
     
     if temps_seleccionadas:
-        datos_tabla = {'Propiedad': [f"Viscosidad a {temp}°C (cSt)" for temp in sorted(temps_seleccionadas)]}
-        for lub in st.session_state.lubricantes:
-            datos_tabla[lub['nombre']] = [get_viscosidad_a_temp(temp, lub['visc_40'], lub['visc_100']) for temp in sorted(temps_seleccionadas)]
-        
-        df = pd.DataFrame(datos_tabla).set_index('Propiedad')
-        
-        iv_calculados = [calcular_indice_viscosidad(lub['visc_40'], lub['visc_100']) for lub in st.session_state.lubricantes]
-        df.loc['Índice de Viscosidad (Calculado)'] = iv_calculados
-        
-        st.dataframe(
-            df.style.format("{:.2f}", na_rep="-").bar(
-                subset=(df.index[:-1], list(df.columns)),
-                align='zero', 
-                color='#AEC6CF'
-            ),
-            use_container_width=True
-        )
+        temps_unicas = sorted(set(temps_seleccionadas))
+        # La tabla solo depende de las temperaturas y de los lubricantes: si no cambiaron
+        # desde el último render (p. ej. un rerun desde la barra lateral), se reutiliza
+        firma = (tuple(temps_unicas), tuple((lub['nombre'], lub['visc_40'], lub['visc_100']) for lub in lubricantes))
+        if st.session_state.get('_firma_tabla') != firma:
+            temps_arr = np.fromiter(temps_unicas, dtype=float, count=len(temps_unicas))
+            temps_labels = [f"Viscosidad a {temp}°C (cSt)" for temp in temps_unicas]
+            tabla = _leer_curvas(_curvas_walther(A, B, C), temps_arr).T
+            iv_calculados = np.fromiter((iv_lubricante(lub) for lub in lubricantes), dtype=float, count=len(lubricantes))
+            
+            # La fila de IV se apila al bloque numérico para construir el DataFrame de una vez
+            df = pd.DataFrame(
+                np.vstack([tabla, iv_calculados]),
+                index=pd.Index(temps_labels + ['Índice de Viscosidad (Calculado)'], name='Propiedad'),
+                columns=[lub['nombre'] for lub in lubricantes]
+            )
+            st.session_state._firma_tabla = firma
+            st.session_state._tabla_estilizada = df.style.format("{:.2f}", na_rep="-").bar(
+                subset=pd.IndexSlice[temps_labels, :],
+                align='zero',
+                color=COLOR_BARRAS
+            )
+        st.dataframe(st.session_state._tabla_estilizada, use_container_width=True)
     else:
         st.warning("Seleccione al menos una temperatura para generar la tabla.", icon="⚠️")
 
+st.title("📊 Analizador de Viscosidad de Lubricantes")
+
+if not st.session_state.lubricantes:
+    # Sin lubricantes (tras "Limpiar Todo" o al borrar el último) no hay tabla ni gráfica:
+    # se descartan las copias guardadas
+    for clave in ('_firma_tabla', '_tabla_estilizada', '_firma_grafica', '_grafica'):
+        st.session_state.pop(clave, None)
+    st.info("Agregue al menos un lubricante en la barra lateral para comenzar.")
+else:
+    lubricantes = list(st.session_state.lubricantes.values())
+    # Constantes de Walther de todos los lubricantes como arrays de forma (L,)
+    A, B, C = (np.array(c) for c in zip(*(constantes_lubricante(lub) for lub in lubricantes)))
+    mostrar_grafica(lubricantes, A, B, C)
+    mostrar_tabla(lubricantes, A, B, C)
+
 st.markdown("---")
 st.write("Desarrollado con Python, Streamlit y Bokeh.")